@@ -12,12 +12,49 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from .config import Config, ConfigError, ConversionFailure, ConvertBoolean, ConvertHashType, \
-    ConvertValue, InvalidConfigError
-from .daemon import Daemonize
-from .database import Database, InfluxDatabase
-from .exceptions import MessageError
-from .executor import Executor, Execute
-from .metrics import Metric, MetricPipeline
-from .result import Result
-from .utils import CloseDescriptor, Command, GetGroupId, GetUserId, Select, SetNonBlocking
+from importlib import import_module
+
+# Public names re-exported by the package and the submodule defining each one. They are
+# imported on first access (PEP 562), so a caller that only needs Config does not pay for
+# loading the executor, the metrics pipeline or the InfluxDB client.
+_exports = {
+    'CloseDescriptor': '.utils',
+    'Command': '.utils',
+    'Config': '.config',
+    'ConfigError': '.config',
+    'ConversionFailure': '.config',
+    'ConvertBoolean': '.config',
+    'ConvertHashType': '.config',
+    'ConvertValue': '.config',
+    'Daemonize': '.daemon',
+    'Database': '.database',
+    'Drain': '.utils',
+    'Execute': '.executor',
+    'Executor': '.executor',
+    'GetGroupId': '.utils',
+    'GetUserId': '.utils',
+    'InfluxDatabase': '.database',
+    'InvalidConfigError': '.config',
+    'MessageError': '.exceptions',
+    'Metric': '.metrics',
+    'MetricPipeline': '.metrics',
+    'Result': '.result',
+    'Select': '.utils',
+    'Selector': '.utils',
+    'SetNonBlocking': '.utils',
+}
+
+__all__ = list(_exports)
+
+
+def __getattr__(name):
+    module = _exports.get(name)
+    if module is None:
+        raise AttributeError("module '{}' has no attribute '{}'".format(__name__, name))
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports))
@@ -25,7 +25,7 @@ from .daemon import Daemonize
 from .exceptions import ExecutorError
 from .metrics import MetricPipeline
 from .result import Result
-from .utils import Callbacks, CloseDescriptor, Select, SetNonBlocking
+from .utils import Callbacks, CloseDescriptor, Drain, Selector, SetNonBlocking
 
 
 class Executor(object):
@@ -57,6 +57,7 @@ class Executor(object):
             self.pipeline = MetricPipeline(self.config, logger=self.logger)
             self.__shutdown = False
             self.__rd, self.__wr = None, None
+            self.__selector = None
             self.__reload = False
 
     @staticmethod
@@ -104,6 +105,8 @@ class Executor(object):
             try:
                 if os.name == 'nt':
                     self.__wr.send(b'.')
+                elif self.__wr == self.__rd:
+                    os.eventfd_write(self.__wr, 1)
                 else:
                     os.write(self.__wr, b'.')
             except (IOError, OSError):
@@ -149,14 +152,24 @@ class Executor(object):
             try:
                 if os.name == 'nt':
                     self.__rd, self.__wr = socket.socketpair()
+                    SetNonBlocking(self.__rd)
+                    SetNonBlocking(self.__wr)
+                elif hasattr(os, 'eventfd'):
+                    # A single eventfd is both ends of the notify channel: each Notify()
+                    # bumps its counter and one read resets it, however many arrived.
+                    self.__rd = self.__wr = os.eventfd(0, os.EFD_CLOEXEC | os.EFD_NONBLOCK)
                 else:
                     self.__rd, self.__wr = os.pipe()
-                SetNonBlocking(self.__rd)
-                SetNonBlocking(self.__wr)
+                    SetNonBlocking(self.__rd)
+                    SetNonBlocking(self.__wr)
             except (IOError, OSError):
                 self.logger.error('Failed to initialize notify socket')
                 raise
 
+            # The notify descriptor is the only one waited on, so its registration is
+            # kept for the whole run and closed before the descriptor itself.
+            self.__selector = Selector()
+
             try:
                 if not self.Start():
                     raise SystemExit
@@ -190,15 +203,8 @@ class Executor(object):
                                 self.logger.info('Flush to database failed. (Queue size: {} metrics)'.format(
                                     len(self.pipeline.queue)))
 
-                            if Select(self.__rd, [], self.interval, logger=self.logger):
-                                try:
-                                    # TODO: Turn this into a Drain() function
-                                    if os.name == 'nt':
-                                        self.__rd.recv(64)
-                                    else:
-                                        os.read(self.__rd, 64)
-                                except (IOError, OSError):
-                                    pass
+                            if self.__selector.Select(self.__rd, [], self.interval, logger=self.logger):
+                                Drain(self.__rd)
                     except KeyboardInterrupt:
                         self.logger.warning('Shutdown initiated')
                         self.__shutdown = True
@@ -210,9 +216,11 @@ class Executor(object):
                 if self.logger:
                     self.logger.exception('Unexpected exception in main loop: {}'.format(e))
             finally:
+                if self.__selector:
+                    self.__selector.Close(logger=self.logger)
                 if self.__rd:
                     CloseDescriptor(self.__rd)
-                if self.__wr:
+                if self.__wr and self.__wr != self.__rd:
                     CloseDescriptor(self.__wr)
                 if self.pipeline:
                     try:
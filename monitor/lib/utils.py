@@ -12,18 +12,50 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from datetime import datetime, timedelta
+import functools
 import os
+import select
 import selectors
-import subprocess
+import time
 from .exceptions import ExecutorError
 
-if os.name == 'posix':
+# Platform checks, evaluated once rather than on every call.
+_IS_NT = os.name == 'nt'
+_IS_POSIX = os.name == 'posix'
+
+if _IS_POSIX:
     import fcntl
     import grp
     import pwd
-if os.name == 'nt':
+
+    # Name lookups go through NSS (files, LDAP, SSSD...), so successful results are
+    # memoized. Failed lookups raise KeyError and are therefore never cached.
+    _getgrnam = functools.lru_cache(maxsize=128)(grp.getgrnam)
+    _getpwnam = functools.lru_cache(maxsize=128)(pwd.getpwnam)
+if _IS_NT:
     import ctypes
+    from ctypes import wintypes
+    import threading
+
+    FORMAT_MESSAGE_FROM_SYSTEM = 0x00001000
+
+    # Bind FormatMessageW with its prototype once, as a private function pointer so
+    # the shared ctypes.windll.kernel32 attribute is left untouched.
+    _FormatMessageW = ctypes.WINFUNCTYPE(
+        wintypes.DWORD,
+        wintypes.DWORD,
+        wintypes.LPCVOID,
+        wintypes.DWORD,
+        wintypes.DWORD,
+        wintypes.LPWSTR,
+        wintypes.DWORD,
+        wintypes.LPVOID)(('FormatMessageW', ctypes.windll.kernel32))
+
+    # Per-thread message buffer reused by GetErrorMessage().
+    _messages = threading.local()
+
+# Number of bytes requested per read when draining a descriptor or command output.
+_READ_SIZE = 64 * 1024
 
 
 class Callbacks(object):
@@ -67,15 +99,313 @@ class Callbacks(object):
             raise ExecutorError('Callback is not callable')
         if name == self.command:
             raise ExecutorError("Cannot register a secondary '{}' command".format(name))
-        for [k, _] in self.callbacks.items():
-            if name == k:
-                raise ExecutorError("Command '{}' already registered".format(name))
+        if name in self.callbacks:
+            raise ExecutorError("Command '{}' already registered".format(name))
         self.callbacks[name] = callback
         parser = self.parsers.add_parser(name, **kwargs)
         parser.add_argument('--config', help='Path to the config file')
         return parser
 
 
+class Selector(object):
+    """
+    Selector which keeps its registrations between waits, so repeated waits on the
+    same descriptors do not rebuild the kernel descriptor set. Each call only applies
+    the difference between the given descriptors and those already registered.
+
+    An instance belongs to its owner: it must not be shared between threads and it
+    must be closed before any of its descriptors are closed, otherwise a reused
+    descriptor number would be matched to a stale registration.
+    """
+
+    def __init__(self):
+        """
+        Constructor. The underlying selector is created on the first wait.
+        """
+        self.selector = None
+        self.events = {}
+
+    def Close(self, logger=None):
+        """
+        Close the underlying selector and forget its registrations.
+
+        :param logger: Optional logger instance in the event of errors.
+        :return: None
+        """
+        selector, self.selector = self.selector, None
+        self.events.clear()
+        if selector is not None:
+            try:
+                selector.close()
+            except Exception as e:
+                if logger:
+                    logger.error('Exception during selector close: %s', e)
+
+    def Select(self, rds, wrts, timeout, logger=None):
+        """
+        Wait for events on the given descriptors. See Select() for the parameters and
+        result.
+        """
+        rds = _AsIterable(rds)
+        wrts = _AsIterable(wrts)
+        start = time.monotonic()
+        res = None
+
+        try:
+            if not rds and not wrts:
+                # Nothing can become ready, so the call is just a sleep for the timeout,
+                # or until interrupted without one, as a wait on no descriptors would be.
+                if timeout is None:
+                    while True:
+                        time.sleep(3600)
+                elif timeout > 0:
+                    time.sleep(timeout)
+                res = []
+            else:
+                res = self._Update(rds, wrts).select(timeout)
+        except os.error as e:
+            self.Close(logger)
+            if logger:
+                logger.error('OSError: [%s] %s', e.errno, e.strerror or os.strerror(e.errno))
+            return None
+        except KeyboardInterrupt:
+            return None
+
+        if logger:
+            duration = time.monotonic() - start
+            logger.debug('Interval completed in: %s', duration)
+
+        return res
+
+    def _Update(self, rds, wrts):
+        """
+        Bring the registrations in line with the given descriptors, creating the
+        selector if needed. Descriptors no longer requested are unregistered, new ones
+        registered and changed event masks modified in place.
+
+        :param rds: Iterable of reader descriptors.
+        :param wrts: Iterable of writer descriptors.
+        :return: Underlying selector instance.
+        """
+        if self.selector is None:
+            self.selector = _Selector()
+
+        desired = {}
+        for rd in rds:
+            desired[rd] = desired.get(rd, 0) | selectors.EVENT_READ
+        for wr in wrts:
+            desired[wr] = desired.get(wr, 0) | selectors.EVENT_WRITE
+
+        # Owners normally wait on the same descriptors every time.
+        if desired == self.events:
+            return self.selector
+
+        for fd in [fd for fd in self.events if fd not in desired]:
+            del self.events[fd]
+            self.selector.unregister(fd)
+        for fd, events in desired.items():
+            current = self.events.get(fd)
+            if current is None:
+                self.selector.register(fd, events)
+            elif current != events:
+                self.selector.modify(fd, events)
+            self.events[fd] = events
+
+        return self.selector
+
+
+class _DefaultSelector(object):
+    """
+    Portable selector used by Selector where epoll is unavailable. It wraps the
+    platform default from the selectors module and reports ready descriptors the
+    same way as _EpollSelector.
+    """
+
+    def __init__(self):
+        """
+        Constructor. Creates the platform default selector.
+        """
+        self.selector = selectors.DefaultSelector()
+
+    def close(self):
+        """
+        Close the selector and release its kernel resources.
+
+        :return: None
+        """
+        self.selector.close()
+
+    def modify(self, fd, events):
+        """
+        Change the events watched for an already registered descriptor.
+
+        :param fd: Registered file descriptor or object with a 'fileno' method.
+        :param events: Combination of selectors.EVENT_READ and selectors.EVENT_WRITE.
+        :return: None
+        """
+        self.selector.modify(fd, events)
+
+    def register(self, fd, events):
+        """
+        Start watching a descriptor for the given events.
+
+        :param fd: File descriptor or object with a 'fileno' method.
+        :param events: Combination of selectors.EVENT_READ and selectors.EVENT_WRITE.
+        :return: None
+        """
+        self.selector.register(fd, events)
+
+    def select(self, timeout):
+        """
+        Wait for events on the registered descriptors.
+
+        :param timeout: Timeout (in seconds) value to wait for an event.
+        :return: List of (descriptor, events) pairs.
+        """
+        return [(key.fileobj, events) for key, events in self.selector.select(timeout)]
+
+    def unregister(self, fd):
+        """
+        Stop watching a descriptor, which may already have been closed.
+
+        :param fd: Registered file descriptor or object with a 'fileno' method.
+        :return: None
+        """
+        self.selector.unregister(fd)
+
+
+class _EpollSelector(object):
+    """
+    Selector used by Selector on Linux. It talks to epoll directly so each wait
+    only builds a (descriptor, events) pair per ready descriptor, rather than the
+    SelectorKey bookkeeping done by the selectors module.
+    """
+
+    def __init__(self):
+        """
+        Constructor. Creates the epoll instance and the map of registered descriptors,
+        keyed by descriptor number.
+        """
+        self.epoll = select.epoll()
+        self.keys = {}
+
+    def close(self):
+        """
+        Close the selector and release its kernel resources.
+
+        :return: None
+        """
+        self.keys.clear()
+        self.epoll.close()
+
+    def modify(self, fd, events):
+        """
+        Change the events watched for an already registered descriptor.
+
+        :param fd: Registered file descriptor or object with a 'fileno' method.
+        :param events: Combination of selectors.EVENT_READ and selectors.EVENT_WRITE.
+        :return: None
+        """
+        fileno = _FileNo(fd)
+        self.epoll.modify(fileno, _EpollMask(events))
+        self.keys[fileno] = (fd, events)
+
+    def register(self, fd, events):
+        """
+        Start watching a descriptor for the given events.
+
+        :param fd: File descriptor or object with a 'fileno' method.
+        :param events: Combination of selectors.EVENT_READ and selectors.EVENT_WRITE.
+        :return: None
+        """
+        fileno = _FileNo(fd)
+        self.epoll.register(fileno, _EpollMask(events))
+        self.keys[fileno] = (fd, events)
+
+    def select(self, timeout):
+        """
+        Wait for events on the registered descriptors.
+
+        :param timeout: Timeout (in seconds) value to wait for an event.
+        :return: List of (descriptor, events) pairs.
+        """
+        # Match the selectors module: None waits indefinitely, while a zero or negative
+        # timeout polls without waiting (epoll would treat a negative one as forever).
+        if timeout is None:
+            timeout = -1
+        elif timeout <= 0:
+            timeout = 0
+
+        ready = []
+        for fileno, mask in self.epoll.poll(timeout):
+            # Errors and hang-ups are reported to both readers and writers.
+            events = 0
+            if mask & ~select.EPOLLIN:
+                events |= selectors.EVENT_WRITE
+            if mask & ~select.EPOLLOUT:
+                events |= selectors.EVENT_READ
+            fd, registered = self.keys[fileno]
+            ready.append((fd, events & registered))
+        return ready
+
+    def unregister(self, fd):
+        """
+        Stop watching a descriptor, which may already have been closed.
+
+        :param fd: Registered file descriptor or object with a 'fileno' method.
+        :return: None
+        """
+        try:
+            fileno = _FileNo(fd)
+        except ValueError:
+            # A closed file object refuses to report its descriptor.
+            fileno = -1
+        if fileno not in self.keys:
+            # Closed sockets report -1, so find it by the registered object.
+            for fileno, (obj, _) in self.keys.items():
+                if obj is fd:
+                    break
+            else:
+                raise KeyError('{!r} is not registered'.format(fd))
+        del self.keys[fileno]
+        try:
+            self.epoll.unregister(fileno)
+        except OSError:
+            # The descriptor was closed, which already removed it from epoll.
+            pass
+
+
+def _EpollMask(events):
+    """
+    Convert selectors event flags into an epoll event mask.
+
+    :param events: Combination of selectors.EVENT_READ and selectors.EVENT_WRITE.
+    :return: epoll event mask.
+    """
+    mask = 0
+    if events & selectors.EVENT_READ:
+        mask |= select.EPOLLIN
+    if events & selectors.EVENT_WRITE:
+        mask |= select.EPOLLOUT
+    return mask
+
+
+def _FileNo(fd):
+    """
+    Return the integer descriptor for a descriptor or an object with a 'fileno'
+    method.
+
+    :param fd: File descriptor or object with a 'fileno' method.
+    :return: Integer file descriptor.
+    """
+    if isinstance(fd, int):
+        return fd
+    return fd.fileno()
+
+
+_Selector = _EpollSelector if hasattr(select, 'epoll') else _DefaultSelector
+
+
 def CloseDescriptor(fd):
     """
     Close a given descriptor. If the object has its own 'close' method that
@@ -85,10 +415,12 @@ def CloseDescriptor(fd):
     :return: None
     """
     try:
-        if hasattr(fd, 'close'):
-            fd.close()
-        else:
+        fd.close()
+    except AttributeError:
+        try:
             os.close(fd)
+        except (IOError, OSError):
+            pass
     except (IOError, OSError):
         pass
 
@@ -97,40 +429,81 @@ def Command(command, stderr=True, cwd=None):
     """
     Execute an external command with the given working directory. The result will
     be the STDOUT data and the return code. If 'stderr' is set to true the STDERR
-    output will be piped to STDOUT otherwise it will be ignored.
+    output will be piped to STDOUT otherwise it will be ignored. If the call is
+    interrupted the output read so far is returned.
 
     :param command: Command parameters to execute.
     :param stderr: Boolean indicating whether STDERR should be piped to STDOUT.
     :param cwd: Current working directory.
     :return: Tuple of process exitcode and STDOUT data.
     """
+    # Deferred so importing the package does not pay for loading subprocess.
+    import subprocess
+
     process = None
-    output = []
+    chunks = []
     try:
-        process = subprocess.Popen(command,
-            cwd=cwd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.STDOUT if stderr else os.devnull)
-
-        while True:
-            if process.poll() is not None:
-                break
-            for line in iter(process.stdout.readline, b''):
-                if len(line.strip()) > 0:
-                    output.append(line.strip())
+        with subprocess.Popen(command,
+                cwd=cwd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT if stderr else subprocess.DEVNULL,
+                close_fds=True) as process:
+            # Keep every chunk as soon as it is read so an interrupt still returns
+            # the output collected up to that point.
+            fd = process.stdout.fileno()
+            while True:
+                chunk = os.read(fd, _READ_SIZE)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            process.wait()
     except KeyboardInterrupt:
         pass
     except OSError:
         raise
 
-    return process.poll(), output
+    output = list(filter(None, map(bytes.strip, b''.join(chunks).splitlines())))
+    if process is None:
+        return None, output
+    return process.returncode, output
+
+
+def _AsIterable(fds):
+    """
+    Treat a single descriptor (an integer or an object with a 'fileno' method) as
+    a one element tuple, and pass any other iterable through unchanged.
+
+    :param fds: Descriptor or iterable of descriptors.
+    :return: Iterable of descriptors.
+    """
+    if hasattr(fds, '__iter__') and not hasattr(fds, 'fileno'):
+        return fds
+    return (fds,)
+
+
+def Drain(fd):
+    """
+    Read and discard everything currently buffered on a non-blocking descriptor,
+    stopping once the read would block or the descriptor reaches EOF. Draining
+    fully means a burst of writes only wakes up the next Select() call once.
+
+    :param fd: Non-blocking file descriptor, or socket on Windows.
+    :return: None
+    """
+    read = fd.recv if _IS_NT else functools.partial(os.read, fd)
+    try:
+        while read(_READ_SIZE):
+            pass
+    except (IOError, OSError):
+        pass
 
 
 def GetErrorMessage(err):
-    if os.name == 'nt':
-        FORMAT_MESSAGE_FROM_SYSTEM = 0x00001000
-        msg_buffer = ctypes.create_unicode_buffer(256)
-        ctypes.windll.kernel32.FormatMessageW(
+    if _IS_NT:
+        msg_buffer = getattr(_messages, 'buffer', None)
+        if msg_buffer is None:
+            msg_buffer = _messages.buffer = ctypes.create_unicode_buffer(256)
+        length = _FormatMessageW(
             FORMAT_MESSAGE_FROM_SYSTEM,
             None,
             err,
@@ -139,7 +512,8 @@ def GetErrorMessage(err):
             len(msg_buffer),
             None)
 
-        return msg_buffer.value.strip()
+        # The buffer is reused, so only trust the characters written by this call.
+        return msg_buffer[:length].strip()
     else:
         return os.strerror(err)
 
@@ -154,9 +528,9 @@ def GetGroupId(group):
     """
     if isinstance(group, int):
         return group
-    if os.name == 'posix':
+    if _IS_POSIX:
         try:
-            return grp.getgrnam(group).gr_gid
+            return _getgrnam(group).gr_gid
         except KeyError:
             pass
     return None
@@ -172,14 +546,19 @@ def GetUserId(user):
     """
     if isinstance(user, int):
         return user
-    if os.name == 'posix':
+    if _IS_POSIX:
         try:
-            return pwd.getpwnam(user).pw_uid
+            return _getpwnam(user).pw_uid
         except KeyError:
             pass
     return None
 
 
+if _IS_POSIX:
+    GetGroupId.cache_clear = _getgrnam.cache_clear
+    GetUserId.cache_clear = _getpwnam.cache_clear
+
+
 def RedirectStream(source, target=None):
     """
     Redirect a source file descriptor to a new target file descriptor. If no target
@@ -189,7 +568,7 @@ def RedirectStream(source, target=None):
     :param target: Target file descriptor. If None is provided /dev/null is used.
     :return: None
     """
-    if os.name == 'posix':
+    if _IS_POSIX:
         if target is None:
             target = os.open(os.devnull, os.O_RDWR)
         else:
@@ -204,51 +583,21 @@ def Select(rds, wrts, timeout, logger=None):
     return None in the event of a failure of the resulting list of descriptors which an
     event occurred on.
 
-    :param rds: Set of reader descriptors.
-    :param wrts: Set of writer descriptors.
+    Each call uses its own selector. Callers that wait on the same descriptors
+    repeatedly can keep a Selector instance instead.
+
+    :param rds: Reader descriptor or an iterable of reader descriptors.
+    :param wrts: Writer descriptor or an iterable of writer descriptors.
     :param timeout: Timeout (in seconds) value to wait for an event.
     :param logger: Optional logger instance in the event of errors.
-    :return: None if a failure occurred, or the descriptors which an event occurred.
+    :return: None if a failure occurred, or a list of (descriptor, events) pairs for the
+             descriptors which an event occurred on.
     """
-    if not isinstance(rds, list):
-        rds = [rds]
-    if not isinstance(wrts, list):
-        wrts = [wrts]
-
-    start = datetime.now()
-    end = start + timedelta(seconds=timeout)
-    selector = selectors.DefaultSelector()
-    res = None
-
+    selector = Selector()
     try:
-        for rd in rds:
-            selector.register(rd, selectors.EVENT_READ)
-        for wr in wrts:
-            selector.register(wr, selectors.EVENT_WRITE)
-
-        while datetime.now() < end:
-            res = selector.select(timeout=0.1)
-            if res:
-                break
-
-    except os.error as e:
-        if logger:
-            logger.error('OSError: [{}] {}'.format(e.errno, GetErrorMessage(e.errno)))
-        return None
-    except KeyboardInterrupt:
-        return None
+        return selector.Select(rds, wrts, timeout, logger=logger)
     finally:
-        try:
-            selector.close()
-        except Exception as e:
-            if logger:
-                logger.error('Exception during selector close: {}'.format(e))
-
-    if logger:
-        duration = datetime.now() - start
-        logger.debug('Interval completed in: {}'.format(duration.total_seconds()))
-
-    return res
+        selector.Close(logger=logger)
 
 
 def SetNonBlocking(fd):
@@ -258,10 +607,10 @@ def SetNonBlocking(fd):
     :param fd: File descriptor object
     :return: None
     """
-    if os.name == 'posix':
+    if _IS_POSIX:
         fl = fcntl.fcntl(fd, fcntl.F_GETFL)
         fcntl.fcntl(fd, fcntl.F_SETFL, fl | os.O_NONBLOCK)
-    if os.name == 'nt':
+    if _IS_NT:
         fd.setblocking(False)
 
 
@@ -277,21 +626,21 @@ def SetProcessOwner(user, group, logger=None):
     :param logger: Optional logger instance in the event of errors.
     :return: None
     """
-    if os.name == 'posix':
+    if _IS_POSIX:
         try:
             if user is not None:
                 os.setuid(user)
         except OSError as e:
             if logger:
-                logger.error("Failed to set process user '{}': [{}] {}".format(
-                    user, e.errno, os.strerror(e.errno)))
+                logger.error("Failed to set process user '%s': [%s] %s",
+                    user, e.errno, os.strerror(e.errno))
         try:
             if group is not None:
                 os.setgid(group)
         except OSError as e:
             if logger:
-                logger.error("Failed to set process group '{}': [{}] {}".format(
-                    group, e.errno, os.strerror(e.errno)))
+                logger.error("Failed to set process group '%s': [%s] %s",
+                    group, e.errno, os.strerror(e.errno))
 
 
 def SetProcessUmask(umask, logger=None):
@@ -302,10 +651,10 @@ def SetProcessUmask(umask, logger=None):
     :param logger: Optional logger instance in the event of errors.
     :return: None
     """
-    if os.name == 'posix':
+    if _IS_POSIX:
         try:
             os.umask(umask)
         except OSError as e:
             if logger:
-                logger.error('Failed to set umask: [{}] {}'.format(
-                    e.errno, os.strerror(e.errno)))
+                logger.error('Failed to set umask: [%s] %s',
+                    e.errno, os.strerror(e.errno))
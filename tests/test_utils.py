@@ -0,0 +1,190 @@
+# Copyright 2019-2024 Daniel Weiner
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import signal
+import threading
+import time
+import unittest
+import warnings
+from monitor.lib.utils import Command, Drain, Select, Selector, SetNonBlocking
+
+
+class CommandTest(unittest.TestCase):
+
+    def testMergedStderr(self):
+        self.assertEqual(Command(['sh', '-c', 'echo out; echo err >&2; exit 3']),
+            (3, [b'out', b'err']))
+
+    def testDiscardedStderr(self):
+        self.assertEqual(Command(['sh', '-c', 'echo out; echo err >&2'], stderr=False),
+            (0, [b'out']))
+
+    def testBlankLines(self):
+        # Lines are stripped and empty ones dropped.
+        self.assertEqual(Command(['printf', 'a\\n\\n  \\n  b  \\n']), (0, [b'a', b'b']))
+
+    def testCarriageReturn(self):
+        # A bare carriage return ends a line, like a newline does.
+        self.assertEqual(Command(['printf', 'a\\rb\\r\\nc']), (0, [b'a', b'b', b'c']))
+
+    def testInterrupted(self):
+        # Output read before the interrupt is still returned.
+        timer = threading.Timer(0.3, os.kill, (os.getpid(), signal.SIGINT))
+        timer.start()
+        start = time.monotonic()
+        with warnings.catch_warnings():
+            # The child is left to finish its sleep, which Popen reports on cleanup.
+            warnings.simplefilter('ignore', ResourceWarning)
+            code, output = Command(['sh', '-c', 'echo first; sleep 1; echo late'])
+        timer.join()
+
+        self.assertLess(time.monotonic() - start, 1.0)
+        self.assertEqual(output, [b'first'])
+
+
+class DrainTest(unittest.TestCase):
+
+    def testPipe(self):
+        # Everything buffered is consumed and the call stops once the read would block.
+        a, b = os.pipe()
+        self.addCleanup(os.close, a)
+        self.addCleanup(os.close, b)
+        SetNonBlocking(a)
+        for _ in range(6):
+            os.write(b, b'.' * 10000)
+
+        self.assertTrue(Select(a, [], 1.0))
+        Drain(a)
+        self.assertEqual(Select(a, [], 0.05), [])
+
+    def testPipeClosed(self):
+        # The call returns at EOF once the writer is gone.
+        a, b = os.pipe()
+        self.addCleanup(os.close, a)
+        SetNonBlocking(a)
+        os.write(b, b'.')
+        os.close(b)
+
+        Drain(a)
+        self.assertEqual(os.read(a, 1), b'')
+
+    @unittest.skipUnless(hasattr(os, 'eventfd'), 'eventfd is not available')
+    def testEventFd(self):
+        # The Executor's notify channel: several notifications, one read resets them.
+        fd = os.eventfd(0, os.EFD_NONBLOCK)
+        self.addCleanup(os.close, fd)
+        selector = Selector()
+        self.addCleanup(selector.Close)
+        for _ in range(5):
+            os.eventfd_write(fd, 1)
+
+        self.assertEqual(selector.Select(fd, [], 1.0), [(fd, 1)])
+        Drain(fd)
+        self.assertEqual(selector.Select(fd, [], 0.05), [])
+
+
+class SelectTest(unittest.TestCase):
+
+    def testReusedDescriptor(self):
+        # Closing a descriptor and getting the same number back from a new pipe must
+        # not leave the new descriptor unwatched.
+        a, b = os.pipe()
+        Select(a, [], 0.01)
+        os.close(a)
+        os.close(b)
+
+        c, d = os.pipe()
+        self.addCleanup(os.close, c)
+        self.addCleanup(os.close, d)
+        os.write(d, b'.')
+
+        start = time.monotonic()
+        self.assertEqual(Select(c, [], 1.0), [(c, 1)])
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def testConcurrentCalls(self):
+        # A wait on another descriptor in a second thread must not steal the first
+        # thread's registration.
+        a, b = os.pipe()
+        c, d = os.pipe()
+        for fd in (a, b, c, d):
+            self.addCleanup(os.close, fd)
+
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(Select(a, [], 2.0)))
+        waiter.start()
+        time.sleep(0.1)
+        Select(c, [], 0.01)
+        os.write(b, b'.')
+        waiter.join()
+
+        self.assertEqual(result, [[(a, 1)]])
+
+    def testNegativeTimeout(self):
+        a, b = os.pipe()
+        self.addCleanup(os.close, a)
+        self.addCleanup(os.close, b)
+
+        start = time.monotonic()
+        self.assertEqual(Select(a, [], -1), [])
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def testEmptyDescriptors(self):
+        start = time.monotonic()
+        self.assertEqual(Select([], [], 0.1), [])
+        self.assertGreaterEqual(time.monotonic() - start, 0.1)
+
+    def testEmptyDescriptorsInterrupted(self):
+        # An interrupt ends the wait with None whether or not there is a timeout.
+        for timeout in (2.0, None):
+            timer = threading.Timer(0.1, os.kill, (os.getpid(), signal.SIGINT))
+            timer.start()
+            start = time.monotonic()
+            self.assertIsNone(Select([], [], timeout))
+            self.assertLess(time.monotonic() - start, 1.0)
+            timer.join()
+
+    def testInterrupted(self):
+        a, b = os.pipe()
+        self.addCleanup(os.close, a)
+        self.addCleanup(os.close, b)
+
+        timer = threading.Timer(0.1, os.kill, (os.getpid(), signal.SIGINT))
+        timer.start()
+        self.assertIsNone(Select(a, [], 2.0))
+        timer.join()
+
+
+class SelectorTest(unittest.TestCase):
+
+    def testClosedFileObject(self):
+        # A registered file object closed between waits must be dropped quietly.
+        selector = Selector()
+        self.addCleanup(selector.Close)
+        a, b = os.pipe()
+        self.addCleanup(os.close, b)
+        f = os.fdopen(a, 'rb')
+        selector.Select(f, [], 0.01)
+        f.close()
+
+        c, d = os.pipe()
+        self.addCleanup(os.close, c)
+        self.addCleanup(os.close, d)
+        os.write(d, b'.')
+        self.assertEqual(selector.Select(c, [], 1.0), [(c, 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()